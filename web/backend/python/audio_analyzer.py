@@ -2,14 +2,30 @@ import sys
 import json
 import time
 import random
-import librosa  # The new library for real audio analysis
 import numpy as np # The library for numerical operations
+from audio_features import SpectralFeatureExtractor, load_audio, parse_frequency_range
+from results_store import register_reference_table, record_results
 
 # --- This is our new "intelligence" factor ---
 # We'll consider any audio with average energy below this threshold as silence.
 # You can experiment with this value; lower values make it more sensitive to quiet sounds.
 SILENCE_THRESHOLD = 0.001
 
+POSSIBLE_SPECIES = ["European Robin", "Great Tit", "Common Nightingale", "Red-winged Blackbird"]
+
+RECOMMENDATIONS = {
+    "silence": [
+        "No significant audio was detected in this recording.",
+        "Try recording in a location with more natural sounds.",
+        "Ensure your microphone is working and not covered."
+    ],
+    "healthy": [
+        "This area shows healthy species diversity.",
+        "Consider conservation efforts for nearby wetlands.",
+        "Continue monitoring during migratory seasons."
+    ]
+}
+
 def get_mock_species_data(species_name):
     """
     Returns a rich, detailed data structure for a given species name.
@@ -23,22 +39,54 @@ def get_mock_species_data(species_name):
     }
     return all_species.get(species_name, { "scientificName": "Unknown", "icon": "❓", "conservationStatus": "Unknown", "description": "Could not identify species.", "habitat": "Unknown", "frequency": "N/A", "callType": "N/A", "sound": "N/A" })
 
-def analyze_audio_file(file_path):
+def create_feature_extractor():
     """
-    A smarter simulation of AI audio analysis.
-    It now performs REAL energy analysis to detect silence.
+    Builds a spectral feature extractor whose bands are the call frequency
+    ranges of the species we can detect.
+    """
+    bands = {}
+    for species_name in POSSIBLE_SPECIES:
+        frequency_range = parse_frequency_range(get_mock_species_data(species_name)["frequency"])
+        if frequency_range: bands[species_name] = frequency_range
+    return SpectralFeatureExtractor(bands)
+
+def analyze_audio_files(file_paths, feature_extractor=None):
+    """
+    Analyses several clips in one go. Non-silent clips have their spectral
+    features extracted together, sharing one extractor and its FFT blocks.
     """
     # --- REAL ANALYSIS STEP ---
-    # Load the audio file using librosa. This gives us the raw sound wave (y)
-    # and the sample rate (sr).
-    y, sr = librosa.load(file_path, sr=None, mono=True, res_type='kaiser_fast')
+    # Load the audio as float32 at its native rate (resampled only if the rate is very high).
+    # This gives us the raw sound wave (y) and the sample rate (sr) of every clip.
+    signals = [load_audio(file_path) for file_path in file_paths]
 
     # Calculate the Root Mean Square (RMS) energy, a measure of average volume.
-    rms_energy = np.sqrt(np.mean(y**2))
+    # Clips below our silence threshold get a specific "silent" result.
+    audible = [i for i, (y, _) in enumerate(signals)
+               if len(y) and np.sqrt(np.mean(np.square(y, dtype=np.float64))) >= SILENCE_THRESHOLD]
+
+    # One batched STFT pass yields every spectral feature for the audible clips.
+    extractor = feature_extractor or create_feature_extractor()
+    features = dict(zip(audible, extractor.extract_signals([signals[i] for i in audible]))) if audible else {}
+
+    # --- SIMULATION STEP (if sound is detected) ---
+    # Audible clips proceed with our previous simulation; the processing time is simulated once per batch.
+    if audible: time.sleep(random.uniform(1.5, 2.5))
 
+    return [build_analysis(y, sr, features.get(i)) for i, (y, sr) in enumerate(signals)]
+
+def analyze_audio_file(file_path, feature_extractor=None):
+    """
+    A smarter simulation of AI audio analysis.
+    It now performs REAL energy analysis to detect silence, and extracts
+    spectral features (species band energies, flux, onset density).
+    """
+    return analyze_audio_files([file_path], feature_extractor)[0]
+
+def build_analysis(y, sr, acoustic_features):
     # --- INTELLIGENT DECISION STEP ---
-    # If the energy is below our silence threshold, return a specific "silent" result.
-    if rms_energy < SILENCE_THRESHOLD:
+    # Silent clips have no spectral features; return a specific "silent" result.
+    if acoustic_features is None:
         return {
             "confidence": 95,
             "analysisQuality": "High",
@@ -48,21 +96,12 @@ def analyze_audio_file(file_path):
                 "shannonIndex": 0,
                 "ecosystemHealth": "Unknown (Silence)"
             },
-            "acousticFeatures": { "duration": librosa.get_duration(y=y, sr=sr), "sampleRate": sr },
-            "recommendations": [
-                "No significant audio was detected in this recording.",
-                "Try recording in a location with more natural sounds.",
-                "Ensure your microphone is working and not covered."
-            ]
+            "acousticFeatures": { "duration": len(y) / sr, "sampleRate": sr },
+            "recommendations": RECOMMENDATIONS["silence"]
         }
 
-    # --- SIMULATION STEP (if sound is detected) ---
-    # If the audio is NOT silent, we proceed with our previous simulation.
-    time.sleep(random.uniform(1.5, 2.5)) # Simulate processing time
-
-    possible_species = ["European Robin", "Great Tit", "Common Nightingale", "Red-winged Blackbird"]
     num_detected = random.randint(1, 3)
-    detected_species_names = random.sample(possible_species, num_detected)
+    detected_species_names = random.sample(POSSIBLE_SPECIES, num_detected)
 
     detected_species_results = []
     for species_name in detected_species_names:
@@ -84,19 +123,22 @@ def analyze_audio_file(file_path):
             "shannonIndex": shannon_index,
             "ecosystemHealth": ecosystem_health
         },
-        "acousticFeatures": { "duration": librosa.get_duration(y=y, sr=sr), "sampleRate": sr },
-        "recommendations": [
-            "This area shows healthy species diversity.",
-            "Consider conservation efforts for nearby wetlands.",
-            "Continue monitoring during migratory seasons."
-        ]
+        "acousticFeatures": acoustic_features,
+        "recommendations": RECOMMENDATIONS["healthy"]
     }
 
+# Stored results reference these by id instead of repeating them.
+register_reference_table("species", {name: get_mock_species_data(name) for name in POSSIBLE_SPECIES})
+register_reference_table("audioRecommendations", RECOMMENDATIONS)
+
 if __name__ == "__main__":
     try:
-        audio_file_path = sys.argv[1]
-        analysis_data = analyze_audio_file(audio_file_path)
-        print(json.dumps(analysis_data, indent=4))
+        # One path prints a single result; several paths are analysed as a batch and print a list.
+        audio_file_paths = sys.argv[1:]
+        if not audio_file_paths: raise ValueError("No audio file path provided")
+        analyses = analyze_audio_files(audio_file_paths)
+        print(json.dumps(analyses[0] if len(analyses) == 1 else analyses, separators=(',', ':')))
+        record_results("audio", analyses)
     except Exception as e:
         print(f"Error in Python script: {e}", file=sys.stderr)
         sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,164 @@
+# FILE: web/backend/python/audio_features.py
+
+import re
+import numpy as np
+import scipy.fft
+import soundfile
+import librosa
+
+# --- STFT settings ---
+# Every clip is framed with the same FFT size, so scipy.fft reuses one cached plan for all of them.
+N_FFT = 2048
+HOP_LENGTH = 512
+# Frames are windowed and transformed this many at a time, into a preallocated float32 buffer.
+BLOCK_FRAMES = 256
+
+# Native rates up to this already cover every species band (up to 8 kHz) without
+# wasting much FFT work, so the file is used as decoded. Anything above is resampled down.
+MAX_NATIVE_SR = 48000
+TARGET_SR = 32000
+
+# Onsets are flux peaks this many standard deviations above the mean flux.
+ONSET_THRESHOLD_STD = 1.5
+
+
+def parse_frequency_range(frequency):
+    """
+    Turns a species 'frequency' string such as '2-6 kHz' into (low_hz, high_hz).
+    Returns None for entries without a usable range (e.g. 'N/A').
+    """
+    match = re.match(r'\s*([\d.]+)\s*-\s*([\d.]+)\s*kHz', frequency or '')
+    if not match: return None
+    return float(match.group(1)) * 1000, float(match.group(2)) * 1000
+
+
+def load_audio(file_path):
+    """
+    Loads a clip as mono float32 at its native rate, only resampling when that rate
+    is above MAX_NATIVE_SR. Falls back to librosa for formats libsndfile cannot decode.
+    """
+    try:
+        y, sr = soundfile.read(file_path, dtype='float32', always_2d=True)
+        y = y.mean(axis=1, dtype=np.float32)
+    except RuntimeError:
+        y, sr = librosa.load(file_path, sr=None, mono=True)
+
+    if sr > MAX_NATIVE_SR:
+        y = librosa.resample(y, orig_sr=sr, target_sr=TARGET_SR)
+        sr = TARGET_SR
+    return np.ascontiguousarray(y, dtype=np.float32), sr
+
+
+class SpectralFeatureExtractor:
+    """
+    Computes the STFT of each clip once and derives band energies, spectral flux and
+    onset density from that single pass. Frames from several clips are packed into the
+    same preallocated float32 block, so a batch goes through shared FFT calls.
+    Window, buffers and per-sample-rate band matrices are reused across clips.
+    """
+
+    def __init__(self, bands, n_fft=N_FFT, hop_length=HOP_LENGTH, block_frames=BLOCK_FRAMES):
+        # bands: {name: (low_hz, high_hz)}
+        self.bands = dict(bands)
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.block_frames = block_frames
+        self.window = np.hanning(n_fft).astype(np.float32)
+        self.frame_buffer = np.empty((block_frames, n_fft), dtype=np.float32)
+        # Row 0 holds the last magnitude frame of the previous block, for flux across block edges.
+        self.magnitude_buffer = np.zeros((block_frames + 1, n_fft // 2 + 1), dtype=np.float32)
+        self._band_matrices = {}
+
+    def _band_matrix(self, sr):
+        if sr not in self._band_matrices:
+            freqs = np.fft.rfftfreq(self.n_fft, d=1.0 / sr)
+            matrix = np.zeros((len(freqs), len(self.bands)), dtype=np.float32)
+            for j, (low, high) in enumerate(self.bands.values()):
+                matrix[(freqs >= low) & (freqs < high), j] = 1.0
+            self._band_matrices[sr] = matrix
+        return self._band_matrices[sr]
+
+    def _frames(self, y):
+        if len(y) < self.n_fft:
+            y = np.pad(y, (0, self.n_fft - len(y)))
+        return np.lib.stride_tricks.sliding_window_view(y, self.n_fft)[::self.hop_length]
+
+    def _extract_group(self, signals, sr):
+        """Runs clips that share a sample rate through one stream of FFT blocks."""
+        band_matrix = self._band_matrix(sr)
+        clip_frames = [self._frames(y) for y in signals]
+        counts = np.array([len(frames) for frames in clip_frames])
+        clip_ids = np.repeat(np.arange(len(signals)), counts)
+        frame_ids = np.concatenate([np.arange(count) for count in counts])
+        n_frames = len(clip_ids)
+
+        band_energy = np.zeros((len(signals), len(self.bands)), dtype=np.float64)
+        total_energy = np.zeros(len(signals), dtype=np.float64)
+        flux = np.empty(n_frames, dtype=np.float32)
+
+        for start in range(0, n_frames, self.block_frames):
+            count = min(self.block_frames, n_frames - start)
+            block = self.frame_buffer[:count]
+            row = 0
+            while row < count:
+                clip, first = clip_ids[start + row], frame_ids[start + row]
+                take = min(count - row, counts[clip] - first)
+                np.multiply(clip_frames[clip][first:first + take], self.window, out=block[row:row + take])
+                row += take
+
+            magnitude = self.magnitude_buffer[1:count + 1]
+            np.abs(scipy.fft.rfft(block, axis=1, overwrite_x=True), out=magnitude, casting='same_kind')
+            power = np.square(magnitude)
+            ids = clip_ids[start:start + count]
+            np.add.at(band_energy, ids, power @ band_matrix)
+            np.add.at(total_energy, ids, power.sum(axis=1))
+
+            # Positive magnitude change frame-to-frame; the first frame of each clip has none.
+            flux[start:start + count] = np.maximum(magnitude - self.magnitude_buffer[:count], 0).sum(axis=1)
+            flux[start:start + count][frame_ids[start:start + count] == 0] = 0
+            self.magnitude_buffer[0] = magnitude[-1]
+
+        features = []
+        for i, (y, clip_flux) in enumerate(zip(signals, np.split(flux, np.cumsum(counts)[:-1]))):
+            duration = len(y) / sr
+            band_fractions = band_energy[i] / total_energy[i] if total_energy[i] > 0 else band_energy[i]
+            features.append({
+                "duration": duration,
+                "sampleRate": sr,
+                "bandEnergies": {name: round(float(v), 4) for name, v in zip(self.bands, band_fractions)},
+                "spectralFlux": round(float(clip_flux.mean()), 4),
+                "onsetDensity": round(self._count_onsets(clip_flux) / duration, 3) if duration > 0 else 0,
+            })
+        return features
+
+    def _count_onsets(self, flux):
+        if len(flux) < 3: return 0
+        threshold = flux.mean() + ONSET_THRESHOLD_STD * flux.std()
+        middle = flux[1:-1]
+        peaks = (middle > threshold) & (middle >= flux[:-2]) & (middle > flux[2:])
+        return int(np.count_nonzero(peaks))
+
+    def extract_signals(self, signals):
+        """
+        Returns one feature dict per (y, sr) pair, in input order. Clips with the same
+        sample rate are batched through shared FFT blocks.
+        """
+        features = [None] * len(signals)
+        by_rate = {}
+        for i, (_, sr) in enumerate(signals):
+            by_rate.setdefault(sr, []).append(i)
+        for sr, indices in by_rate.items():
+            for i, clip_features in zip(indices, self._extract_group([signals[i][0] for i in indices], sr)):
+                features[i] = clip_features
+        return features
+
+    def extract(self, y, sr):
+        """Returns a feature dict for one mono float32 signal."""
+        return self.extract_signals([(y, sr)])[0]
+
+    def extract_file(self, file_path):
+        return self.extract(*load_audio(file_path))
+
+    def extract_batch(self, file_paths):
+        """Loads and extracts features for many clips at once (all clips are held in memory)."""
+        return self.extract_signals([load_audio(path) for path in file_paths])
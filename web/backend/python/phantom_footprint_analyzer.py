@@ -3,6 +3,7 @@
 import sys
 import json
 import random
+from results_store import register_reference_table, record_result
 
 # --- UPGRADED KNOWLEDGE BASE ---
 # We've added more categories and more specific data
@@ -109,13 +110,17 @@ def analyze_phantom_footprint(url):
     }
     return report
 
+# Stored reports reference category recommendations by id instead of repeating them.
+register_reference_table("categoryRecommendations", {category: data["recommendations"] for category, data in product_category_db.items()})
+
 if __name__ == "__main__":
     try:
         input_data = json.load(sys.stdin)
         url = input_data.get('url')
         if not url: raise ValueError("Missing product URL.")
         analysis_report = analyze_phantom_footprint(url)
-        print(json.dumps(analysis_report))
+        print(json.dumps(analysis_report, separators=(',', ':')))
+        record_result("phantom_footprint", analysis_report)
     except Exception as e:
         print(json.dumps({"error": str(e)}), file=sys.stderr)
         sys.exit(1)
\ No newline at end of file
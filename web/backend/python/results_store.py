@@ -0,0 +1,192 @@
+# FILE: web/backend/python/results_store.py
+
+import os
+import sys
+import json
+import hashlib
+from datetime import datetime, timezone
+
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'results', 'analysis_results.ndjson')
+
+# Static reference data (species details, category recommendations, ...) registered by the analyzers.
+# Result values that contain one of these entries are stored as {"$ref": "<table>/<id>#<hash>"}.
+REFERENCE_TABLES = {}
+
+_COMPACT = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def register_reference_table(table, entries):
+    """
+    Registers static data that results may embed. entries maps an id to either a dict
+    (matched when a result dict contains all of its items) or a list (matched by equality).
+    """
+    REFERENCE_TABLES[table] = dict(entries)
+
+
+def refs_path_for(results_path):
+    root, _ = os.path.splitext(results_path)
+    return f"{root}.refs.ndjson"
+
+
+def _ref_id(table, entry_id, data):
+    # The content hash keeps old records pointing at the data they were written with.
+    digest = hashlib.sha1(json.dumps(data, sort_keys=True, **_COMPACT).encode('utf-8')).hexdigest()[:8]
+    return f"{table}/{entry_id}#{digest}"
+
+
+class ResultsWriter:
+    """
+    Appends analysis results as one compact JSON object per line. Registered reference
+    data is replaced by ids; each referenced entry is written once to a sidecar file.
+    """
+
+    def __init__(self, path=RESULTS_PATH):
+        self.path = path
+        self.refs_path = refs_path_for(path)
+        self._known_refs = set(_load_refs(self.refs_path))
+        self._dict_refs, self._list_refs = [], {}
+        for table, entries in REFERENCE_TABLES.items():
+            for entry_id, data in entries.items():
+                ref = _ref_id(table, entry_id, data)
+                if isinstance(data, dict) and data:
+                    self._dict_refs.append((ref, data))
+                elif isinstance(data, list) and data:
+                    self._list_refs[json.dumps(data, **_COMPACT)] = (ref, data)
+
+    def append(self, analysis_type, result):
+        new_refs = {}
+        record = {
+            "type": analysis_type,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "result": self._compact(result, new_refs),
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if new_refs:
+            # Reference data is written before the record that points at it.
+            _append_lines(self.refs_path, [json.dumps({"ref": ref, "data": data}, **_COMPACT) for ref, data in new_refs.items()])
+            self._known_refs.update(new_refs)
+        _append_lines(self.path, [json.dumps(record, **_COMPACT)])
+
+    def _use_ref(self, ref, data, new_refs):
+        if ref not in self._known_refs: new_refs[ref] = data
+        return ref
+
+    def _compact(self, value, new_refs):
+        if isinstance(value, dict):
+            for ref, data in self._dict_refs:
+                if all(key in value and value[key] == item for key, item in data.items()):
+                    rest = {key: self._compact(item, new_refs) for key, item in value.items() if key not in data}
+                    return {"$ref": self._use_ref(ref, data, new_refs), **rest}
+            return {key: self._compact(item, new_refs) for key, item in value.items()}
+        if isinstance(value, list):
+            match = self._list_refs.get(json.dumps(value, **_COMPACT)) if self._list_refs else None
+            if match:
+                return {"$ref": self._use_ref(match[0], match[1], new_refs)}
+            return [self._compact(item, new_refs) for item in value]
+        return value
+
+
+def _append_lines(path, lines):
+    # A torn write can leave the file without a trailing newline; start on a fresh line
+    # so the new entry is not glued onto the broken one.
+    prefix = ''
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n': prefix = '\n'
+    except FileNotFoundError:
+        pass
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(prefix + ''.join(line + '\n' for line in lines))
+
+
+def _parse_line(line):
+    # Torn or malformed lines are skipped rather than breaking every later read.
+    if not line.strip(): return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def _load_refs(refs_path):
+    refs = {}
+    try:
+        with open(refs_path, encoding='utf-8') as f:
+            for line in f:
+                entry = _parse_line(line)
+                if isinstance(entry, dict) and "ref" in entry and "data" in entry:
+                    refs[entry["ref"]] = entry["data"]
+    except FileNotFoundError:
+        pass
+    return refs
+
+
+class ResultsReader:
+    """
+    Streams stored results line by line, so filtering never loads the whole file.
+    """
+
+    def __init__(self, path=RESULTS_PATH):
+        self.path = path
+        self.refs_path = refs_path_for(path)
+        self._refs = None
+
+    def scan(self, analysis_type=None, since=None, where=None, resolve=True):
+        """
+        Yields stored records, oldest first.
+        analysis_type: only records of this type (checked before the line is parsed).
+        since: ISO timestamp; only records at or after it.
+        where: optional predicate called with the record.
+        resolve: expand references back into the full reference data. A reference
+                 missing from the sidecar is left as its {"$ref": ...} marker.
+        Undecodable lines (e.g. a torn final write) are skipped.
+        """
+        prefix = '{"type":' + json.dumps(analysis_type, **_COMPACT) + ',' if analysis_type else None
+        try:
+            f = open(self.path, encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                if prefix and not line.startswith(prefix): continue
+                record = _parse_line(line)
+                if not isinstance(record, dict) or "result" not in record: continue
+                if since and record.get("timestamp", "") < since: continue
+                if resolve: record["result"] = self.resolve(record["result"])
+                if where and not where(record): continue
+                yield record
+
+    def resolve(self, value):
+        if self._refs is None: self._refs = _load_refs(self.refs_path)
+        if isinstance(value, dict):
+            if "$ref" in value and value["$ref"] in self._refs:
+                data = self._refs[value["$ref"]]
+                if isinstance(data, list): return list(data)
+                expanded = dict(data)
+                expanded.update((key, self.resolve(item)) for key, item in value.items() if key != "$ref")
+                return expanded
+            return {key: self.resolve(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.resolve(item) for item in value]
+        return value
+
+
+def record_results(analysis_type, results, path=RESULTS_PATH):
+    """
+    Appends several results through one writer, so the sidecar is read and the
+    reference tables hashed once. Persisting is best-effort and never fails an analysis.
+    """
+    try:
+        writer = ResultsWriter(path)
+        for result in results:
+            writer.append(analysis_type, result)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Could not store {analysis_type} result: {e}", file=sys.stderr)
+
+
+def record_result(analysis_type, result, path=RESULTS_PATH):
+    """Appends a single result to the store; see record_results."""
+    record_results(analysis_type, [result], path)
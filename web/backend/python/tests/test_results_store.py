@@ -0,0 +1,80 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import results_store
+from results_store import ResultsReader, ResultsWriter, refs_path_for
+
+SPECIES = {"Great Tit": {"scientificName": "Parus major", "frequency": "3-7 kHz"}}
+TIPS = {"healthy": ["Keep monitoring.", "Protect wetlands."]}
+
+
+def audio_result(confidence):
+    return {
+        "detectedSpecies": [dict(SPECIES["Great Tit"], name="Great Tit", confidence=confidence)],
+        "recommendations": list(TIPS["healthy"]),
+    }
+
+
+class ResultsStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.saved_tables = dict(results_store.REFERENCE_TABLES)
+        results_store.REFERENCE_TABLES.clear()
+        results_store.register_reference_table("species", SPECIES)
+        results_store.register_reference_table("tips", TIPS)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'results.ndjson')
+
+    def tearDown(self):
+        results_store.REFERENCE_TABLES.clear()
+        results_store.REFERENCE_TABLES.update(self.saved_tables)
+        self.tmp.cleanup()
+
+    def test_round_trip_stores_references_once(self):
+        writer = ResultsWriter(self.path)
+        writer.append("audio", audio_result(80))
+        writer.append("water", {"ph": 7.0})
+        ResultsWriter(self.path).append("audio", audio_result(90))
+
+        with open(refs_path_for(self.path)) as f:
+            self.assertEqual(len(f.readlines()), 2)
+        with open(self.path) as f:
+            self.assertNotIn("Parus major", f.read())
+
+        records = list(ResultsReader(self.path).scan("audio"))
+        self.assertEqual([r["result"] for r in records], [audio_result(80), audio_result(90)])
+        self.assertEqual([r["result"] for r in ResultsReader(self.path).scan("water")], [{"ph": 7.0}])
+
+    def test_record_results_appends_batch(self):
+        results_store.record_results("audio", [audio_result(70), audio_result(75), audio_result(80)], self.path)
+
+        with open(refs_path_for(self.path)) as f:
+            self.assertEqual(len(f.readlines()), 2)
+        records = list(ResultsReader(self.path).scan("audio"))
+        self.assertEqual([r["result"] for r in records], [audio_result(70), audio_result(75), audio_result(80)])
+
+    def test_torn_lines_are_skipped(self):
+        ResultsWriter(self.path).append("audio", audio_result(80))
+        with open(self.path, 'a') as f:
+            f.write('{"type":"audio","timestamp":"2026')
+        with open(refs_path_for(self.path), 'a') as f:
+            f.write('{"ref":"species/Gr')
+
+        # A later write starts on a fresh line instead of extending the torn one.
+        ResultsWriter(self.path).append("audio", audio_result(90))
+        records = list(ResultsReader(self.path).scan())
+        self.assertEqual([r["result"] for r in records], [audio_result(80), audio_result(90)])
+
+    def test_missing_reference_keeps_marker(self):
+        ResultsWriter(self.path).append("audio", audio_result(80))
+        os.remove(refs_path_for(self.path))
+
+        species = next(ResultsReader(self.path).scan())["result"]["detectedSpecies"][0]
+        self.assertIn("$ref", species)
+        self.assertEqual(species["confidence"], 80)
+
+
+if __name__ == '__main__':
+    unittest.main()
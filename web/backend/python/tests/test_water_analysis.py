@@ -0,0 +1,126 @@
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from water_analysis import WaterQualityAnalyzer, GEOMETRY_CACHE_MAX_ENTRIES
+
+PARAMETERS = ['ph', 'chlorine', 'nitrates', 'hardness', 'alkalinity', 'bacteria']
+PAD_COLORS = [(255, 100, 100), (255, 240, 150), (255, 150, 150), (150, 255, 150), (255, 255, 100), (100, 255, 100)]
+BACKGROUNDS = {'white': (255, 255, 255), 'grey': (200, 200, 200), 'brown table': (150, 120, 90), 'dark': (60, 50, 40)}
+
+
+def write_strip(path, x_offset, background=(255, 255, 255), noise=0, seed=0):
+    """
+    Vertical strip of six pads on a 400x1200 background, shifted sideways by x_offset.
+    With noise, the photo gets Gaussian noise and sharpening and should be saved as a JPEG,
+    like uploads after server-side preprocessing.
+    """
+    image = np.full((1200, 400, 3), background, np.uint8)
+    image[40:1160, x_offset:x_offset + 120] = (240, 240, 230)
+    for i, color in enumerate(PAD_COLORS):
+        top = 80 + i * 180
+        image[top:top + 120, x_offset + 10:x_offset + 110] = color
+    if noise:
+        noisy = image + np.random.default_rng(seed).normal(0, noise, image.shape)
+        image = cv2.filter2D(np.clip(noisy, 0, 255).astype(np.uint8), -1, np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]]))
+    params = [cv2.IMWRITE_JPEG_QUALITY, 95] if path.endswith('.jpg') else []
+    cv2.imwrite(path, cv2.cvtColor(image, cv2.COLOR_RGB2BGR), params)
+
+
+class PadGeometryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp.name, 'geometry.json')
+        self.left = os.path.join(self.tmp.name, 'left.png')
+        self.right = os.path.join(self.tmp.name, 'right.png')
+        write_strip(self.left, 20)
+        write_strip(self.right, 260)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def analyzer(self):
+        return WaterQualityAnalyzer(self.cache_path)
+
+    def test_repeat_shot_uses_cached_geometry(self):
+        first = self.analyzer().analyze_water_quality(self.left, capture_profile='rig-1')
+        second = self.analyzer().analyze_water_quality(self.left, capture_profile='rig-1')
+        self.assertEqual(first['padLocalization'], 'detected')
+        self.assertEqual(second['padLocalization'], 'cached')
+        self.assertEqual(first['ph'], second['ph'])
+
+    def test_shifted_strip_is_redetected(self):
+        self.analyzer().analyze_water_quality(self.left, capture_profile='rig-1')
+        shifted = self.analyzer().analyze_water_quality(self.right, capture_profile='rig-1')
+        os.remove(self.cache_path)
+        fresh = self.analyzer().analyze_water_quality(self.right, capture_profile='rig-1')
+
+        self.assertEqual(shifted['padLocalization'], 'detected')
+        for param in PARAMETERS:
+            self.assertAlmostEqual(shifted[param], fresh[param])
+
+    def test_detects_off_centre_strip_on_any_background(self):
+        centred = os.path.join(self.tmp.name, 'centred.png')
+        write_strip(centred, 140)
+        expected = self.analyzer().analyze_water_quality(centred)
+        for name, background in BACKGROUNDS.items():
+            for x_offset in (20, 260):
+                with self.subTest(background=name, x_offset=x_offset):
+                    path = os.path.join(self.tmp.name, 'strip.png')
+                    write_strip(path, x_offset, background)
+                    result = self.analyzer().analyze_water_quality(path)
+                    self.assertEqual(result['padLocalization'], 'detected')
+                    for param in PARAMETERS:
+                        self.assertAlmostEqual(result[param], expected[param], places=3)
+
+    def test_noisy_jpeg_repeat_shots_use_cache(self):
+        for name, background in BACKGROUNDS.items():
+            with self.subTest(background=name):
+                localizations = []
+                for seed in range(3):
+                    path = os.path.join(self.tmp.name, f'shot{seed}.jpg')
+                    write_strip(path, 30, background, noise=10, seed=seed)
+                    result = self.analyzer().analyze_water_quality(path, capture_profile=f'rig-{name.replace(" ", "-")}')
+                    localizations.append(result['padLocalization'])
+                self.assertEqual(localizations, ['detected', 'cached', 'cached'])
+
+    def test_shifted_strip_on_dark_background_is_redetected(self):
+        dark = BACKGROUNDS['dark']
+        write_strip(self.left, 20, dark, noise=6, seed=0)
+        shifted_path = os.path.join(self.tmp.name, 'shifted.jpg')
+        write_strip(shifted_path, 80, dark, noise=6, seed=1)
+        self.analyzer().analyze_water_quality(self.left, capture_profile='rig-1')
+        shifted = self.analyzer().analyze_water_quality(shifted_path, capture_profile='rig-1')
+        self.assertEqual(shifted['padLocalization'], 'detected')
+
+    def test_no_cache_without_capture_profile(self):
+        self.analyzer().analyze_water_quality(self.left)
+        result = self.analyzer().analyze_water_quality(self.left)
+        self.assertEqual(result['padLocalization'], 'detected')
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_invalid_capture_profile_is_not_cached(self):
+        self.analyzer().analyze_water_quality(self.left, capture_profile='../../etc/passwd')
+        self.analyzer().analyze_water_quality(self.left, capture_profile='x' * 65)
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_cache_size_is_capped(self):
+        analyzer = self.analyzer()
+        boxes = analyzer._legacy_pad_boxes()
+        for i in range(GEOMETRY_CACHE_MAX_ENTRIES + 10):
+            analyzer._store_geometry(f"rig-{i}", boxes)
+        with open(self.cache_path) as f:
+            cache = json.load(f)
+        self.assertEqual(len(cache), GEOMETRY_CACHE_MAX_ENTRIES)
+        self.assertNotIn('rig-0', cache)
+        self.assertIn(f"rig-{GEOMETRY_CACHE_MAX_ENTRIES + 9}", cache)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,9 +4,31 @@ import cv2
 import numpy as np
 from skimage import color as skimage_color
 import os
+import re
+from results_store import record_result
+
+PARAMETER_NAMES = ['ph', 'chlorine', 'nitrates', 'hardness', 'alkalinity', 'bacteria']
+
+# --- Pad localisation settings ---
+# Detection runs on a copy whose longest side is at most this many pixels;
+# only the pad interiors are then sampled from the full-resolution image.
+DETECTION_MAX_SIDE = 160
+# Minimum LAB distance (OpenCV 8-bit scale) from the dominant colour for a pixel to count as pad.
+PAD_COLOR_THRESHOLD = 20
+# Fraction trimmed from every side of a pad box so edges and glare are not averaged in.
+PAD_INTERIOR_MARGIN = 0.2
+# Cached geometry is re-detected when a pad interior is less uniform than this (LAB std-dev on
+# the OpenCV 8-bit scale), which means the boxes no longer sit on the pads. It is measured on the
+# downsampled image, where sensor and JPEG noise is averaged out but pad edges are not.
+PAD_MAX_INTERIOR_STD = 12
+# Pad geometry is only cached for an explicit capture device/template id of this form.
+CAPTURE_PROFILE_PATTERN = re.compile(r'[A-Za-z0-9._-]{1,64}')
+GEOMETRY_CACHE_MAX_ENTRIES = 256
+GEOMETRY_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'results', 'strip_geometry_cache.json')
 
 class WaterQualityAnalyzer:
-    def __init__(self):
+    def __init__(self, geometry_cache_path=GEOMETRY_CACHE_PATH):
+       self.geometry_cache_path = geometry_cache_path
        self.lab_calibration = {
     'ph': [
         ((54, 81, 69), 4.0),
@@ -84,25 +106,205 @@ class WaterQualityAnalyzer:
         
         return best_value, confidence
 
-    def analyze_water_quality(self, image_path, water_source='unknown'):
+    def _legacy_pad_boxes(self):
+        # Six equal horizontal bands, as used before pad detection existed.
+        return [(0.0, i / len(PARAMETER_NAMES), 1.0, (i + 1) / len(PARAMETER_NAMES)) for i in range(len(PARAMETER_NAMES))]
+
+    def _find_runs(self, profile, min_length):
+        runs, start = [], None
+        for i, active in enumerate(np.append(profile, False)):
+            if active and start is None:
+                start = i
+            elif not active and start is not None:
+                if i - start >= min_length: runs.append((start, i))
+                start = None
+        return runs
+
+    def _downsample_lab(self, image_rgb):
+        # OpenCV 8-bit LAB: L scaled to 0-255, a and b offset by 128.
+        height, width = image_rgb.shape[:2]
+        scale = min(1.0, DETECTION_MAX_SIDE / max(height, width))
+        small = cv2.resize(image_rgb, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_RGB2LAB).astype(np.float32)
+
+    def _pad_contrast(self, lab1, lab2):
+        # Distance between two skimage LAB colours on the OpenCV 8-bit scale used by PAD_COLOR_THRESHOLD.
+        delta = np.asarray(lab1, dtype=np.float64) - np.asarray(lab2, dtype=np.float64)
+        return np.linalg.norm(delta * (255 / 100, 1, 1))
+
+    def _to_skimage_lab(self, cv_lab):
+        return (cv_lab[0] * 100 / 255, cv_lab[1] - 128, cv_lab[2] - 128)
+
+    def _surround_lab(self, small_lab, box):
+        # Median colour of a ring around the box: strip base or background when the box sits on a pad.
+        small_h, small_w = small_lab.shape[:2]
+        x0, y0, x1, y1 = box
+        bw, bh = x1 - x0, y1 - y0
+        outer = (max(0, int((x0 - 0.6 * bw) * small_w)), max(0, int((y0 - 0.6 * bh) * small_h)),
+                 min(small_w, int(np.ceil((x1 + 0.6 * bw) * small_w))), min(small_h, int(np.ceil((y1 + 0.6 * bh) * small_h))))
+        inner = (int((x0 - 0.2 * bw) * small_w), int((y0 - 0.2 * bh) * small_h),
+                 int(np.ceil((x1 + 0.2 * bw) * small_w)), int(np.ceil((y1 + 0.2 * bh) * small_h)))
+        ring = np.ones((outer[3] - outer[1], outer[2] - outer[0]), bool)
+        ring[max(0, inner[1] - outer[1]):max(0, inner[3] - outer[1]), max(0, inner[0] - outer[0]):max(0, inner[2] - outer[0])] = False
+        pixels = small_lab[outer[1]:outer[3], outer[0]:outer[2]][ring]
+        if not len(pixels): return None
+        return self._to_skimage_lab(np.median(pixels, axis=0))
+
+    def _geometry_fits(self, image_rgb, boxes, means):
+        """
+        Checks that boxes reused from the cache still sit on six pads: every interior is
+        uniform, stands out from the colour immediately around it, and the pads are
+        not all the same colour.
+        """
+        small_lab = self._downsample_lab(image_rgb)
+        for box in boxes:
+            interior = small_lab[self._interior(small_lab.shape, box)].reshape(-1, 3)
+            if np.linalg.norm(np.std(interior, axis=0)) > PAD_MAX_INTERIOR_STD: return False
+        for box, mean in zip(boxes, means):
+            surround = self._surround_lab(small_lab, box)
+            if surround is None or self._pad_contrast(mean, surround) <= PAD_COLOR_THRESHOLD: return False
+        return max(self._pad_contrast(a, b) for i, a in enumerate(means) for b in means[i + 1:]) > PAD_COLOR_THRESHOLD
+
+    def _find_strip(self, small_lab):
+        """
+        Returns (strip_mask, base_colour) for the largest region that differs from the
+        background (median border colour), or None if there is no such region.
+        """
+        border = np.concatenate([small_lab[0], small_lab[-1], small_lab[:, 0], small_lab[:, -1]])
+        background = np.median(border, axis=0)
+        foreground = (np.linalg.norm(small_lab - background, axis=2) > PAD_COLOR_THRESHOLD).astype(np.uint8)
+        foreground = cv2.morphologyEx(foreground, cv2.MORPH_CLOSE, np.ones((3, 3), np.uint8))
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(foreground)
+        if count < 2: return None
+        strip = labels == 1 + np.argmax(stats[1:, cv2.CC_STAT_AREA])
+
+        # Each pad covers only a small share of the strip, so the most common colour is the bare base.
+        # Its edge pixels blend with the background after downsampling and are left out.
+        inner = cv2.erode(strip.astype(np.uint8), np.ones((3, 3), np.uint8)).astype(bool)
+        pixels = small_lab[inner] if inner.any() else small_lab[strip]
+        bins = (pixels // (PAD_COLOR_THRESHOLD / 2)).astype(np.int32)
+        keys, inverse, counts = np.unique(bins, axis=0, return_inverse=True, return_counts=True)
+        base = np.median(pixels[inverse.ravel() == np.argmax(counts)], axis=0)
+        return inner, base
+
+    def _pad_boxes_in_region(self, small_lab, region, reference):
+        mask = (region & (np.linalg.norm(small_lab - reference, axis=2) > PAD_COLOR_THRESHOLD)).astype(np.uint8)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+        if not mask.any(): return None
+
+        ys, xs = np.nonzero(mask)
+        y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+        pads = mask[y0:y1, x0:x1]
+        horizontal = (x1 - x0) >= (y1 - y0)
+
+        # Project the mask onto the strip axis; each pad shows up as a run of occupied positions.
+        profile = pads.mean(axis=0 if horizontal else 1)
+        runs = self._find_runs(profile > 0.5 * profile.max(), min_length=2)
+        if len(runs) < len(PARAMETER_NAMES): return None
+        runs = sorted(sorted(runs, key=lambda r: r[1] - r[0], reverse=True)[:len(PARAMETER_NAMES)])
+
+        small_h, small_w = mask.shape
+        boxes = []
+        for start, end in runs:
+            if horizontal:
+                cross = np.nonzero(pads[:, start:end].any(axis=1))[0]
+                box = (x0 + start, y0 + cross.min(), x0 + end, y0 + cross.max() + 1)
+            else:
+                cross = np.nonzero(pads[start:end, :].any(axis=0))[0]
+                box = (x0 + cross.min(), y0 + start, x0 + cross.max() + 1, y0 + end)
+            boxes.append((box[0] / small_w, box[1] / small_h, box[2] / small_w, box[3] / small_h))
+        return boxes
+
+    def detect_pad_boxes(self, image_rgb):
+        """
+        Locates the six pads on a downsampled copy of the image: first the strip (largest
+        region that differs from the background), then the pads inside it (areas that
+        differ from the strip's base colour).
+        Returns normalised (x0, y0, x1, y1) boxes in parameter order, or None if
+        six distinct pads could not be found.
+        """
+        small_lab = self._downsample_lab(image_rgb)
+        strip = self._find_strip(small_lab)
+        boxes = self._pad_boxes_in_region(small_lab, *strip) if strip is not None else None
+        if boxes is None:
+            # A strip base close to the background colour (e.g. white on white) does not separate
+            # from it; then pads are simply whatever differs from the dominant colour.
+            reference = np.median(small_lab.reshape(-1, 3), axis=0)
+            boxes = self._pad_boxes_in_region(small_lab, np.ones(small_lab.shape[:2], bool), reference)
+        return boxes
+
+    def _sample_pad_lab(self, image_rgb, box):
+        height, width = image_rgb.shape[:2]
+        roi_lab = skimage_color.rgb2lab(image_rgb[self._interior(image_rgb.shape, box)]).reshape(-1, 3)
+        return np.mean(roi_lab, axis=0)
+
+    def _interior(self, shape, box):
+        # Pixel slices of a normalised box with PAD_INTERIOR_MARGIN trimmed from every side.
+        height, width = shape[:2]
+        x0, y0, x1, y1 = box
+        mx, my = (x1 - x0) * PAD_INTERIOR_MARGIN, (y1 - y0) * PAD_INTERIOR_MARGIN
+        left, right = int(round((x0 + mx) * width)), int(round((x1 - mx) * width))
+        top, bottom = int(round((y0 + my) * height)), int(round((y1 - my) * height))
+        return slice(top, max(bottom, top + 1)), slice(left, max(right, left + 1))
+
+    def _analyze_pads(self, image_rgb, boxes):
+        results, confidences, means = {}, {}, []
+        for param, box in zip(PARAMETER_NAMES, boxes):
+            avg_lab_color = self._sample_pad_lab(image_rgb, box)
+            value, confidence = self.analyze_parameter(avg_lab_color, param)
+            results[param] = value
+            confidences[param] = round(confidence)
+            means.append(avg_lab_color)
+        return results, confidences, means
+
+    def _load_geometry_cache(self):
+        try:
+            with open(self.geometry_cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _store_geometry(self, key, boxes):
+        cache = self._load_geometry_cache()
+        cache.pop(key, None)
+        cache[key] = [list(box) for box in boxes]
+        # Oldest detections are evicted first so the file stays small.
+        for stale_key in list(cache)[:-GEOMETRY_CACHE_MAX_ENTRIES]:
+            del cache[stale_key]
+        try:
+            os.makedirs(os.path.dirname(self.geometry_cache_path), exist_ok=True)
+            tmp_path = f"{self.geometry_cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, self.geometry_cache_path)
+        except OSError:
+            pass  # Caching is an optimisation; analysis must not fail because of it.
+
+    def analyze_water_quality(self, image_path, water_source='unknown', capture_profile=None):
         image = cv2.imread(image_path)
         if image is None: raise ValueError(f"Could not load image: {image_path}")
         
         image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        height = image_rgb.shape[0]
-        pad_height = height // 6
-        regions_of_interest = [image_rgb[i * pad_height:(i + 1) * pad_height, :] for i in range(6)]
+        # Repeat shots from the same capture device/template share pad geometry. Without an
+        # explicit id nothing is cached, since unrelated photos would share the same key.
+        cache_key = capture_profile if capture_profile and CAPTURE_PROFILE_PATTERN.fullmatch(capture_profile) else None
 
-        parameter_names = ['ph', 'chlorine', 'nitrates', 'hardness', 'alkalinity', 'bacteria']
-        results, confidences = {}, {}
+        localization, results, confidences = None, None, None
+        cached_boxes = self._load_geometry_cache().get(cache_key) if cache_key else None
+        if cached_boxes and len(cached_boxes) == len(PARAMETER_NAMES):
+            results, confidences, means = self._analyze_pads(image_rgb, cached_boxes)
+            if self._geometry_fits(image_rgb, cached_boxes, means):
+                localization = "cached"
 
-        for i, param in enumerate(parameter_names):
-            roi_rgb = regions_of_interest[i]
-            roi_lab = skimage_color.rgb2lab(roi_rgb)
-            avg_lab_color = np.mean(roi_lab.reshape(-1, 3), axis=0)
-            value, confidence = self.analyze_parameter(avg_lab_color, param)
-            results[param] = value
-            confidences[param] = round(confidence)
+        if localization is None:
+            boxes = self.detect_pad_boxes(image_rgb)
+            if boxes is not None:
+                localization = "detected"
+                if cache_key: self._store_geometry(cache_key, boxes)
+            else:
+                localization = "fallback"
+                boxes = self._legacy_pad_boxes()
+            results, confidences, _ = self._analyze_pads(image_rgb, boxes)
             
         overall_confidence = round(np.mean(list(confidences.values())))
 
@@ -111,7 +313,7 @@ class WaterQualityAnalyzer:
             "nitrates": results.get('nitrates', 0), "hardness": results.get('hardness', 0),
             "alkalinity": results.get('alkalinity', 0), "bacteria": results.get('bacteria', 0),
             "confidence": overall_confidence, "individualConfidences": confidences,
-            "processingMethod": "Python CV (LAB Space)",
+            "processingMethod": "Python CV (LAB Space)", "padLocalization": localization,
         }
 
 def main():
@@ -121,6 +323,7 @@ def main():
     
     image_path = sys.argv[1]
     water_source = sys.argv[2] if len(sys.argv) > 2 else 'unknown'
+    capture_profile = sys.argv[3] if len(sys.argv) > 3 else None
     
     if not os.path.exists(image_path):
         print(json.dumps({"error": f"Image file not found: {image_path}"}), file=sys.stderr)
@@ -128,8 +331,9 @@ def main():
     
     try:
         analyzer = WaterQualityAnalyzer()
-        results = analyzer.analyze_water_quality(image_path, water_source)
-        print(json.dumps(results, indent=4))
+        results = analyzer.analyze_water_quality(image_path, water_source, capture_profile)
+        print(json.dumps(results, separators=(',', ':')))
+        record_result("water", results)
     except Exception as e:
         print(json.dumps({"error": str(e)}), file=sys.stderr)
         sys.exit(1)
@@ -168,9 +168,12 @@ function fallbackAnalysis(imagePath, waterSource) {
 
 
 // ... (All of your helper functions for water/ewaste analysis remain)
-function callPythonAnalysis(imagePath, waterSource) {
+function callPythonAnalysis(imagePath, waterSource, deviceId) {
     return new Promise((resolve, reject) => {
-      const pythonProcess = spawn('python', ['python/water_analysis.py', imagePath, waterSource || 'unknown']);
+      const args = ['python/water_analysis.py', imagePath, waterSource || 'unknown'];
+      // Lets the analyzer reuse cached pad geometry for this capture rig; ids are kept short and filename-safe.
+      if (typeof deviceId === 'string' && /^[A-Za-z0-9._-]{1,64}$/.test(deviceId)) args.push(deviceId);
+      const pythonProcess = spawn('python', args);
       
       let dataString = '';
       let errorString = '';
@@ -422,7 +425,7 @@ app.post('/api/analyze-water', imageUpload.single('image'), async (req, res) =>
         return res.status(400).json({ error: 'No image file provided' });
       }
   
-      const { waterSource, latitude, longitude, userId } = req.body;
+      const { waterSource, latitude, longitude, userId, deviceId } = req.body;
       const imagePath = req.file.path;
       const testId = uuidv4();
   
@@ -451,7 +454,7 @@ app.post('/api/analyze-water', imageUpload.single('image'), async (req, res) =>
       }
   
       // Step 3: AI analysis with Python
-      const analysisResult = await callPythonAnalysis(processedImagePath, waterSource);
+      const analysisResult = await callPythonAnalysis(processedImagePath, waterSource, deviceId);
       console.log('✅ AI analysis completed');
       
       const processingTime = (Date.now() - startTime) / 1000;